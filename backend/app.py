@@ -1,106 +1,201 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from flask_compress import Compress
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import orjson
+import os
+import queue
 import sys
 import traceback
-from data_fetcher import fetch_stock_data
-from feature_engineering import calculate_features
-from clustering import perform_clustering
-from portfolio_optimizer import optimize_portfolio
-from backtesting import backtest_strategy
+from cache import result_cache, ttl_for_window
+from jobs import queue as job_queue
+from schemas import OptimizeRequest, ValidationError, format_validation_error
+from worker import run_optimize
+
+# Request threads only enqueue log records; a background listener thread
+# does the actual (blocking) writes to stderr
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.getLogger().addHandler(logging.handlers.QueueHandler(_log_queue))
+logging.getLogger().setLevel(os.getenv('LOG_LEVEL', 'INFO'))
+
+logger = logging.getLogger(__name__)
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _dumps(obj):
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS)
+
+class ORJSONProvider(JSONProvider):
+    """Serialize responses with orjson (handles numpy arrays/scalars natively)"""
+
+    def dumps(self, obj, **kwargs):
+        return _dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+_INDEX_TICKERS = {
+    'NIFTY50': (
+        'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS',
+        'HINDUNILVR.NS', 'ITC.NS', 'SBIN.NS', 'BHARTIARTL.NS', 'KOTAKBANK.NS',
+        'LT.NS', 'AXISBANK.NS', 'ASIANPAINT.NS', 'MARUTI.NS', 'SUNPHARMA.NS',
+        'TITAN.NS', 'ULTRACEMCO.NS', 'BAJFINANCE.NS', 'NESTLEIND.NS', 'WIPRO.NS'
+    ),
+    'NIFTYBANK': (
+        'HDFCBANK.NS', 'ICICIBANK.NS', 'SBIN.NS', 'KOTAKBANK.NS', 'AXISBANK.NS',
+        'INDUSINDBK.NS', 'BANDHANBNK.NS', 'FEDERALBNK.NS', 'IDFCFIRSTB.NS', 'PNB.NS'
+    ),
+}
+
+# Serialized (and hashed for the ETag) once; a fresh Response is built per
+# request because after_request hooks (compression, CORS) mutate the response
+def _static_json(obj):
+    body = orjson.dumps(obj)
+    return body, hashlib.blake2b(body, digest_size=16).hexdigest()
+
+_INDEX_TICKERS_JSON = {
+    name: _static_json({"tickers": list(tickers)})
+    for name, tickers in _INDEX_TICKERS.items()
+}
 
 app = Flask(__name__)
-CORS(app)
+app.json = ORJSONProvider(app)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_LEVEL'] = 4
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 1024
+Compress(app)
+
+ALLOWED_ORIGIN = os.getenv('FRONTEND_ORIGIN', '*')
+
+@app.after_request
+def add_cors_headers(response):
+    # Static CORS headers; preflight OPTIONS requests are answered by Flask's
+    # automatic OPTIONS handling and pick these up as well
+    response.headers['Access-Control-Allow-Origin'] = ALLOWED_ORIGIN
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, If-None-Match'
+    response.headers['Access-Control-Max-Age'] = '86400'
+    return response
+
+# Part of every result key; bump it whenever a change alters the pipeline's
+# output so results cached (and ETags issued) by older code are not reused
+RESULT_VERSION = 2
+
+def _request_key(req):
+    """Canonical hash of a validated request, used as result cache key and ETag"""
+    canonical = orjson.dumps(
+        {"version": RESULT_VERSION, "request": req.model_dump(mode='json')},
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+def _run_and_store(req, key, use_cache=True, progress=None):
+    """Run the pipeline and return the serialized response, caching it when allowed"""
+    result = run_optimize(req, use_cache, progress=progress)
+    body = _dumps(result)
+    if use_cache:
+        result_cache.set(key, body, ttl_for_window(req.end_date))
+    return body
+
+def _optimize_job(req, key, use_cache, progress=None):
+    # Fragment embeds the already-serialized result in the job status response
+    return orjson.Fragment(_run_and_store(req, key, use_cache, progress))
+
+def _json_response(obj, status=200):
+    """Build a JSON response straight from orjson bytes (no str round-trip)"""
+    return app.response_class(_dumps(obj), status=status, mimetype='application/json')
+
+def _error_response(context, e):
+    """Log the current exception once; only expose the traceback in debug mode"""
+    tb = traceback.format_exc()
+    logger.error("%s: %s\n%s", context, e, tb)
+    body = {"error": str(e)}
+    if app.debug:
+        body["traceback"] = tb
+    return _json_response(body, 500)
+
+def _result_response(body, key=None, status=200):
+    # Weak ETag: Flask-Compress rewrites strong ETags per encoding. Uncached
+    # results get none since the key doesn't identify a stored representation
+    response = app.response_class(body, status=status, mimetype='application/json')
+    if key is not None:
+        response.set_etag(key, weak=True)
+    return response
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "message": "Portfolio Optimizer API is running"})
+    return _json_response({"status": "healthy", "message": "Portfolio Optimizer API is running"})
 
 @app.route('/api/optimize', methods=['POST'])
 def optimize():
     try:
-        data = request.json
-        
-        # Extract parameters
-        tickers = data.get('tickers', [])
-        start_date = data.get('start_date')
-        end_date = data.get('end_date')
-        n_clusters = data.get('n_clusters', 4)
-        risk_free_rate = data.get('risk_free_rate', 0.05)
-        
-        if not tickers or not start_date or not end_date:
-            return jsonify({"error": "Missing required parameters"}), 400
-        
-        # Step 1: Fetch data
-        print(f"Fetching data for {len(tickers)} stocks...")
-        stock_data = fetch_stock_data(tickers, start_date, end_date)
+        try:
+            req = OptimizeRequest.model_validate(request.get_json(silent=True))
+        except ValidationError as e:
+            return _json_response({"error": format_validation_error(e)}, 400)
         
-        if stock_data.empty:
-            return jsonify({"error": "No data fetched. Check tickers and date range."}), 400
+        use_cache = request.args.get('no_cache') != '1'
+        key = _request_key(req)
         
-        # Step 2: Calculate features
-        print("Calculating technical indicators...")
-        features_df = calculate_features(stock_data)
+        if use_cache:
+            body = result_cache.get(key)
+            if body is not None:
+                # No If-None-Match handling: 304 is only defined for GET/HEAD
+                logger.info("Serving cached result %s", key)
+                return _result_response(body, key)
         
-        # Step 3: Perform clustering
-        print(f"Performing K-means clustering with {n_clusters} clusters...")
-        cluster_results = perform_clustering(features_df, n_clusters)
+        # Synchronous path kept for debugging
+        if request.args.get('sync') == '1':
+            body = _run_and_store(req, key, use_cache)
+            return _result_response(body, key if use_cache else None)
         
-        # Step 4: Optimize portfolio
-        print("Optimizing portfolio...")
-        portfolio_results = optimize_portfolio(
-            stock_data, 
-            cluster_results['labels'], 
-            risk_free_rate
-        )
+        job_id = job_queue.enqueue(_optimize_job, req, key, use_cache)
+        logger.info("Queued optimization job %s for %d stocks", job_id, len(req.tickers))
         
-        # Step 5: Backtest
-        print("Backtesting strategy...")
-        backtest_results = backtest_strategy(
-            stock_data, 
-            portfolio_results['weights']
-        )
-        
-        response = {
-            "success": True,
-            "clusters": cluster_results,
-            "portfolio": portfolio_results,
-            "backtest": backtest_results,
-            "message": "Portfolio optimization completed successfully"
-        }
-        
-        return jsonify(response)
+        return _json_response({"job_id": job_id, "status": "queued"}, 202)
         
     except Exception as e:
-        print(f"Error in optimize endpoint: {str(e)}")
-        traceback.print_exc()
-        return jsonify({
-            "error": str(e),
-            "traceback": traceback.format_exc()
-        }), 500
+        return _error_response("Error in optimize endpoint", e)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll the status and result of a queued optimization job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return _json_response({"error": "Job not found"}, 404)
+    
+    response = {"job_id": job_id, "status": job['status'], "stage": job.get('stage')}
+    if job['status'] == 'finished':
+        response['result'] = job['result']
+    elif job['status'] == 'failed':
+        response['error'] = job['error']
+    
+    return _json_response(response)
 
 @app.route('/api/tickers/<index>', methods=['GET'])
 def get_index_tickers(index):
     """Get list of tickers for a given index"""
-    try:
-        if index.upper() == 'NIFTY50':
-            tickers = [
-                'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS',
-                'HINDUNILVR.NS', 'ITC.NS', 'SBIN.NS', 'BHARTIARTL.NS', 'KOTAKBANK.NS',
-                'LT.NS', 'AXISBANK.NS', 'ASIANPAINT.NS', 'MARUTI.NS', 'SUNPHARMA.NS',
-                'TITAN.NS', 'ULTRACEMCO.NS', 'BAJFINANCE.NS', 'NESTLEIND.NS', 'WIPRO.NS'
-            ]
-        elif index.upper() == 'NIFTYBANK':
-            tickers = [
-                'HDFCBANK.NS', 'ICICIBANK.NS', 'SBIN.NS', 'KOTAKBANK.NS', 'AXISBANK.NS',
-                'INDUSINDBK.NS', 'BANDHANBNK.NS', 'FEDERALBNK.NS', 'IDFCFIRSTB.NS', 'PNB.NS'
-            ]
-        else:
-            return jsonify({"error": "Index not supported"}), 400
-        
-        return jsonify({"tickers": tickers})
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    entry = _INDEX_TICKERS_JSON.get(index.upper())
+    if entry is None:
+        return _json_response({"error": "Index not supported"}, 400)
+    
+    body, etag = entry
+    if request.if_none_match.contains_weak(etag):
+        response = _result_response(None, etag, status=304)
+    else:
+        response = _result_response(body, etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=os.getenv('DEBUG') == '1', host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -1,70 +1,92 @@
+import logging
+import math
+
 import numpy as np
 import pandas as pd
 
-def backtest_strategy(stock_data, portfolio_weights, initial_capital=100000):
+logger = logging.getLogger(__name__)
+
+def backtest_strategy(stock_data, portfolio_weights, initial_capital=100000, price_data=None,
+                      risk_free_rate=0.05):
     """
     Backtest the portfolio strategy
     
     Parameters:
-    - stock_data: DataFrame with stock prices
+    - stock_data: DataFrame with stock prices (multi-index: date, ticker)
     - portfolio_weights: Dictionary of ticker: weight
     - initial_capital: Starting capital
+    - price_data: Optional wide DataFrame of adjusted closes (date x ticker);
+      pass it to skip re-pivoting stock_data
+    - risk_free_rate: Annual risk-free rate for the Sharpe ratio
     
     Returns:
     - Dictionary with backtest results and metrics
     """
     try:
         # Get price data
-        price_data = stock_data['adj close'].unstack('ticker')
+        if price_data is None:
+            price_data = stock_data['adj close'].unstack('ticker')
         
         # Filter to portfolio stocks
         portfolio_tickers = list(portfolio_weights.keys())
-        prices = price_data[portfolio_tickers].dropna()
+        prices = price_data[portfolio_tickers]
+        
+        # Work on a contiguous float64 matrix; pandas is only used for the date labels
+        arr = prices.to_numpy(dtype=np.float64)
+        price_dates = prices.index
+        
+        # Keep only dates where every portfolio stock has a price (as dropna() did);
+        # the common case has no gaps and skips the copy
+        valid = ~np.isnan(arr).any(axis=1)
+        if not valid.all():
+            arr = arr[valid]
+            price_dates = price_dates[valid]
+        arr = np.ascontiguousarray(arr)
+        weights = np.array([portfolio_weights[t] for t in portfolio_tickers], dtype=np.float64)
         
-        # Calculate portfolio value
-        weights = np.array([portfolio_weights[t] for t in portfolio_tickers])
-        returns = prices.pct_change().fillna(0)
-        portfolio_returns = (returns * weights).sum(axis=1)
+        # Daily returns (first row 0), matching pct_change().fillna(0)
+        returns = np.zeros_like(arr)
+        np.divide(arr[1:], arr[:-1], out=returns[1:])
+        returns[1:] -= 1.0
+        portfolio_returns = returns @ weights
         
         # Cumulative returns
-        cumulative_returns = (1 + portfolio_returns).cumprod()
-        portfolio_value = initial_capital * cumulative_returns
+        portfolio_value = initial_capital * np.cumprod(1.0 + portfolio_returns)
         
         # Calculate metrics
-        total_return = (portfolio_value.iloc[-1] / initial_capital) - 1
-        annualized_return = ((1 + total_return) ** (252 / len(portfolio_returns))) - 1
-        volatility = portfolio_returns.std() * np.sqrt(252)
-        sharpe_ratio = (annualized_return - 0.05) / volatility if volatility > 0 else 0
+        total_return = (portfolio_value[-1] / initial_capital) - 1
+        annualized_return = math.expm1(math.log1p(total_return) * 252 / len(portfolio_returns))
+        volatility = portfolio_returns.std(ddof=1) * np.sqrt(252)
+        sharpe_ratio = (annualized_return - risk_free_rate) / volatility if volatility > 0 else 0
         
         # Max drawdown
-        cumulative = portfolio_value
-        running_max = cumulative.expanding().max()
-        drawdown = (cumulative - running_max) / running_max
+        running_max = np.maximum.accumulate(portfolio_value)
+        drawdown = (portfolio_value - running_max) / running_max
         max_drawdown = drawdown.min()
         
-        # Prepare time series data for frontend
-        dates = portfolio_value.index.strftime('%Y-%m-%d').tolist()
-        values = portfolio_value.tolist()
+        # Prepare time series data for frontend; the value array is passed
+        # through as-is since orjson serializes NumPy arrays natively
+        dates = price_dates.strftime('%Y-%m-%d').tolist()
         
         results = {
             'initial_capital': initial_capital,
-            'final_value': float(portfolio_value.iloc[-1]),
-            'total_return': float(total_return),
-            'annualized_return': float(annualized_return),
-            'volatility': float(volatility),
-            'sharpe_ratio': float(sharpe_ratio),
-            'max_drawdown': float(max_drawdown),
+            'final_value': portfolio_value[-1],
+            'total_return': total_return,
+            'annualized_return': annualized_return,
+            'volatility': volatility,
+            'sharpe_ratio': sharpe_ratio,
+            'max_drawdown': max_drawdown,
             'time_series': {
                 'dates': dates,
-                'portfolio_values': values
+                'portfolio_values': portfolio_value
             }
         }
         
-        print(f"Backtest complete. Total Return: {total_return:.2%}")
-        print(f"Sharpe Ratio: {sharpe_ratio:.3f}, Max Drawdown: {max_drawdown:.2%}")
+        logger.info("Backtest complete. Total Return: %.2f%%", total_return * 100)
+        logger.info("Sharpe Ratio: %.3f, Max Drawdown: %.2f%%", sharpe_ratio, max_drawdown * 100)
         
         return results
         
     except Exception as e:
-        print(f"Error in backtesting: {str(e)}")
+        logger.error("Error in backtesting: %s", e)
         raise
\ No newline at end of file
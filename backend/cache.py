@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from weakref import WeakValueDictionary
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+class FileCache:
+    """
+    Two-level cache for DataFrames: an in-memory LRU in front of
+    zstd-compressed parquet files on disk. Subclasses change the storage
+    format by overriding `suffix`, `_read`, `_write` and `_copy`.
+
+    The TTL is fixed when an entry is written: the file's mtime is set to
+    its expiry time, so a later read can never extend it. Expired files
+    are deleted when read and swept from the directory on every write.
+    """
+
+    suffix = '.parquet'
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_days=1, max_memory_items=32):
+        self.cache_dir = cache_dir
+        self.ttl_days = ttl_days
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._key_locks = WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a stable cache key from strings / iterables of strings"""
+        flat = []
+        for part in parts:
+            if isinstance(part, (list, tuple, set)):
+                flat.append(','.join(sorted(str(p) for p in part)))
+            else:
+                flat.append(str(part))
+        return hashlib.md5('|'.join(flat).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}{self.suffix}')
+
+    def _read(self, path):
+        return pd.read_parquet(path)
+
+    def _write(self, value, path):
+        value.to_parquet(path, compression='zstd')
+
+    def _copy(self, value):
+        return value.copy()
+
+    def get(self, key):
+        """Return a cached value or None if missing/expired"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now <= expires_at:
+                    self._memory.move_to_end(key)
+                    return self._copy(value)
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            expires_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        if now > expires_at:
+            _remove(path)
+            return None
+
+        value = self._read(path)
+        self._remember(key, value, expires_at)
+        return self._copy(value)
+
+    def set(self, key, value, ttl_days=None):
+        """Store a value in memory and on disk for ttl_days (default: the cache's TTL)"""
+        ttl_days = ttl_days if ttl_days is not None else self.ttl_days
+        expires_at = time.time() + ttl_days * 86400
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._prune_disk()
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        self._write(value, tmp_path)
+        os.utime(tmp_path, (expires_at, expires_at))
+        os.replace(tmp_path, path)
+        self._remember(key, self._copy(value), expires_at)
+
+    def get_or_compute(self, key, compute, ttl_days=None):
+        """
+        Return the cached value for key, computing and storing it on a miss.
+        Concurrent misses for the same key wait for a single computation.
+        """
+        df = self.get(key)
+        if df is not None:
+            logger.info("Cache hit for %s", key)
+            return df
+
+        with self._key_lock(key):
+            # Another thread may have filled the entry while we waited
+            df = self.get(key)
+            if df is not None:
+                logger.info("Cache hit for %s", key)
+                return df
+
+            df = compute()
+            if not df.empty:
+                self.set(key, df, ttl_days)
+            return df
+
+    def _prune_disk(self):
+        """Delete expired entries so the directory doesn't grow without bound"""
+        now = time.time()
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(self.suffix) and entry.is_file():
+                    try:
+                        expired = entry.stat().st_mtime < now
+                    except OSError:
+                        continue
+                    if expired:
+                        _remove(entry.path)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+class ResultCache(FileCache):
+    """FileCache for serialized JSON responses, stored gzip-compressed"""
+
+    suffix = '.json.gz'
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read())
+
+    def _write(self, value, path):
+        with open(path, 'wb') as f:
+            f.write(gzip.compress(value, compresslevel=6))
+
+    def _copy(self, value):
+        return value
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def ttl_for_window(end_date):
+    """
+    Pick a cache TTL in days for data about to be stored for a date window:
+    windows that reach today can still change, closed historic windows are
+    effectively immutable. Call it at write time, not when reading.
+    """
+    if str(end_date) >= date.today().isoformat():
+        return 1
+    return 90
+
+price_cache = FileCache(ttl_days=1)
+result_cache = ResultCache(os.path.join(CACHE_DIR, 'results'), ttl_days=1)
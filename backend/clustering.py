@@ -1,9 +1,11 @@
+import logging
 import numpy as np
 import pandas as pd
 from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import silhouette_score
 
+logger = logging.getLogger(__name__)
+
 def perform_clustering(df, n_clusters=4):
     """
     Perform K-means clustering on the latest month's data
@@ -20,15 +22,21 @@ def perform_clustering(df, n_clusters=4):
         latest_date = df.index.get_level_values('date').max()
         latest_data = df.loc[latest_date]
         
-        print(f"Clustering data from {latest_date} with {len(latest_data)} stocks")
+        logger.info("Clustering data from %s with %d stocks", latest_date, len(latest_data))
         
         # Select features for clustering (exclude return columns)
         feature_cols = [col for col in latest_data.columns if not col.startswith('return')]
         X = latest_data[feature_cols].values
         
-        # Standardize features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # Standardize features (same as StandardScaler: population std,
+        # constant columns left unscaled). The column selection is usually
+        # Fortran-ordered; writing the result in C order up front saves the
+        # copy KMeans and silhouette_score would otherwise make
+        mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        std[std == 0] = 1.0
+        X_scaled = np.subtract(X, mean, order='C')
+        X_scaled /= std
         
         # Perform K-means
         kmeans = KMeans(
@@ -42,31 +50,43 @@ def perform_clustering(df, n_clusters=4):
         # Calculate silhouette score
         silhouette = silhouette_score(X_scaled, labels)
         
-        # Get cluster statistics
+        # Get cluster statistics: one grouped mean and one stable sort
+        # instead of masking the frame per cluster
+        counts = np.bincount(labels, minlength=n_clusters)
+        averages = (
+            latest_data[['rsi', 'garman_klass_vol']]
+            .groupby(labels)
+            .mean()
+            .reindex(range(n_clusters))
+        )
+        order = np.argsort(labels, kind='stable')
+        members = np.split(latest_data.index.to_numpy()[order], np.cumsum(counts)[:-1])
+        
+        avg_rsi = averages['rsi'].to_numpy()
+        avg_volatility = averages['garman_klass_vol'].to_numpy()
+        
         cluster_stats = []
         for i in range(n_clusters):
-            cluster_mask = labels == i
-            cluster_stocks = latest_data.index[cluster_mask].tolist()
             cluster_stats.append({
-                'cluster_id': int(i),
-                'n_stocks': int(np.sum(cluster_mask)),
-                'stocks': cluster_stocks,
-                'avg_rsi': float(latest_data.loc[cluster_mask, 'rsi'].mean()),
-                'avg_volatility': float(latest_data.loc[cluster_mask, 'garman_klass_vol'].mean())
+                'cluster_id': i,
+                'n_stocks': counts[i],
+                'stocks': members[i].tolist(),
+                'avg_rsi': avg_rsi[i],
+                'avg_volatility': avg_volatility[i]
             })
         
         results = {
             'n_clusters': n_clusters,
-            'silhouette_score': float(silhouette),
+            'silhouette_score': silhouette,
             'labels': labels.tolist(),
             'cluster_stats': cluster_stats,
             'tickers': latest_data.index.tolist()
         }
         
-        print(f"Clustering complete. Silhouette score: {silhouette:.3f}")
+        logger.info("Clustering complete. Silhouette score: %.3f", silhouette)
         
         return results
         
     except Exception as e:
-        print(f"Error in clustering: {str(e)}")
+        logger.error("Error in clustering: %s", e)
         raise
\ No newline at end of file
@@ -1,8 +1,18 @@
+import logging
+import threading
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+MAX_DOWNLOAD_THREADS = 16
+
+# yf.download keeps per-call results in module-level state (reset on every
+# call in 0.2.x), so concurrent jobs must not download at the same time
+_download_lock = threading.Lock()
+
 def fetch_stock_data(tickers, start_date, end_date):
     """
     Fetch historical stock data from Yahoo Finance
@@ -16,16 +26,20 @@ def fetch_stock_data(tickers, start_date, end_date):
     - DataFrame with multi-index (date, ticker) and OHLCV data
     """
     try:
-        print(f"Downloading data for {len(tickers)} tickers from {start_date} to {end_date}...")
+        logger.info("Downloading data for %d tickers from %s to %s...", len(tickers), start_date, end_date)
         
-        # Download data
-        df = yf.download(
-            tickers=tickers,
-            start=start_date,
-            end=end_date,
-            auto_adjust=False,
-            progress=False
-        )
+        df = _download(tickers, start_date, end_date)
+        
+        # Tickers that failed in the batch (typically rate limited) come back
+        # as all-NaN columns; retry just those as one more threaded batch
+        missing = _missing_tickers(df, tickers)
+        if missing:
+            logger.info("Retrying %d tickers that returned no data...", len(missing))
+            retried = _download(missing, start_date, end_date)
+            if df.empty:
+                df = retried
+            elif not retried.empty:
+                df = pd.concat([df.drop(columns=missing, level=1), retried], axis=1).sort_index(axis=1)
         
         if df.empty:
             raise ValueError("No data downloaded. Check tickers and dates.")
@@ -36,10 +50,31 @@ def fetch_stock_data(tickers, start_date, end_date):
         df.columns = df.columns.str.lower()
         df.columns.name = None
         
-        print(f"Successfully downloaded {len(df)} data points")
+        logger.info("Successfully downloaded %d data points", len(df))
         
         return df
         
     except Exception as e:
-        print(f"Error fetching data: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error("Error fetching data: %s", e)
+        raise
+
+def _download(tickers, start_date, end_date):
+    # yfinance fetches tickers on a thread pool which by default is only
+    # 2x CPU count - size it for I/O instead
+    with _download_lock:
+        return yf.download(
+            tickers=tickers,
+            start=start_date,
+            end=end_date,
+            auto_adjust=False,
+            progress=False,
+            multi_level_index=True,
+            threads=min(MAX_DOWNLOAD_THREADS, len(tickers))
+        )
+
+def _missing_tickers(df, tickers):
+    """Requested tickers with no downloaded prices"""
+    if df.empty:
+        return list(tickers)
+    present = set(df.dropna(axis=1, how='all').columns.get_level_values(1))
+    return [t for t in tickers if t not in present]
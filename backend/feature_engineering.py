@@ -1,8 +1,11 @@
+import logging
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.trend import MACD
+
+logger = logging.getLogger(__name__)
+
+# Columns that are not carried into the monthly frame via .last()
+NON_LAST_COLS = frozenset({'dollar_volume', 'volume', 'open', 'high', 'low', 'close'})
 
 def calculate_features(df):
     """
@@ -14,111 +17,134 @@ def calculate_features(df):
     Returns:
     - DataFrame with calculated features
     """
-    print("Calculating Garman-Klass Volatility...")
+    logger.info("Calculating Garman-Klass Volatility...")
     df['garman_klass_vol'] = (
         (np.log(df['high']) - np.log(df['low']))**2 / 2 - 
         (2*np.log(2) - 1) * (np.log(df['adj close']) - np.log(df['open']))**2
     )
     
-    print("Calculating RSI...")
-    def calc_rsi(x):
-        try:
-            rsi = RSIIndicator(close=x, window=20)
-            return rsi.rsi()
-        except:
-            return pd.Series(index=x.index, dtype=float)
-    
-    df['rsi'] = df.groupby(level=1)['adj close'].transform(calc_rsi)
-    
-    print("Calculating Bollinger Bands...")
-    def calc_bollinger(x):
-        try:
-            bb = BollingerBands(close=np.log1p(x), window=20, window_dev=2)
-            return pd.DataFrame({
-                'bb_low': bb.bollinger_lband(),
-                'bb_mid': bb.bollinger_mavg(),
-                'bb_high': bb.bollinger_hband()
-            })
-        except:
-            return pd.DataFrame({
-                'bb_low': pd.Series(index=x.index, dtype=float),
-                'bb_mid': pd.Series(index=x.index, dtype=float),
-                'bb_high': pd.Series(index=x.index, dtype=float)
-            })
-    
-    bb_data = df.groupby(level=1)['adj close'].apply(calc_bollinger)
-    df['bb_low'] = bb_data['bb_low'].values
-    df['bb_mid'] = bb_data['bb_mid'].values
-    df['bb_high'] = bb_data['bb_high'].values
-    
-    print("Calculating ATR...")
-    def compute_atr(stock_data):
-        try:
-            atr_indicator = AverageTrueRange(
-                high=stock_data['high'],
-                low=stock_data['low'],
-                close=stock_data['close'],
-                window=14
-            )
-            atr = atr_indicator.average_true_range()
-            return atr.sub(atr.mean()).div(atr.std())
-        except:
-            return pd.Series(index=stock_data.index, dtype=float)
-    
-    df['atr'] = df.groupby(level=1, group_keys=False).apply(compute_atr)
-    
-    print("Calculating MACD...")
-    def compute_macd(close):
-        try:
-            macd = MACD(close=close, window_slow=26, window_fast=12, window_sign=9)
-            macd_line = macd.macd()
-            return macd_line.sub(macd_line.mean()).div(macd_line.std())
-        except:
-            return pd.Series(index=close.index, dtype=float)
-    
-    df['macd'] = df.groupby(level=1, group_keys=False)['adj close'].apply(compute_macd)
-    
-    print("Calculating Dollar Volume...")
+    # Indicators are computed for all tickers at once with pandas' grouped
+    # diff/shift/rolling/ewm kernels; each row only sees its own ticker's
+    # history, so gaps in one ticker don't shift another's windows
+    close = df['adj close']
+    
+    logger.info("Calculating RSI...")
+    diff = close.groupby(level='ticker').diff()
+    moves = pd.DataFrame({
+        'up': diff.clip(lower=0).fillna(0.0),
+        'down': -diff.clip(upper=0).fillna(0.0)
+    })
+    avg = _ewm_by_ticker(moves, alpha=1 / 20, min_periods=20)
+    df['rsi'] = np.where(avg['down'] == 0, 100, 100 - 100 / (1 + avg['up'] / avg['down']))
+    
+    logger.info("Calculating Bollinger Bands...")
+    log_close = np.log1p(close)
+    rolling = log_close.groupby(level='ticker').rolling(20)
+    bb_mid = _align(rolling.mean(), df.index)
+    bb_std = _align(rolling.std(ddof=0), df.index)
+    df['bb_low'] = bb_mid - 2 * bb_std
+    df['bb_mid'] = bb_mid
+    df['bb_high'] = bb_mid + 2 * bb_std
+    
+    logger.info("Calculating ATR...")
+    prev_close = df['close'].groupby(level='ticker').shift()
+    true_range = pd.concat([
+        df['high'] - df['low'],
+        (df['high'] - prev_close).abs(),
+        (df['low'] - prev_close).abs()
+    ], axis=1).max(axis=1)
+    by_ticker = true_range.groupby(level='ticker')
+    position = by_ticker.cumcount()
+    # Wilder smoothing seeded with the mean of the first 14 true ranges;
+    # earlier rows are 0 and tickers with fewer than 14 rows get no ATR
+    seed = _align(by_ticker.rolling(14).mean(), df.index)
+    wilder_input = true_range.where(position > 13).mask(position == 13, seed)
+    atr = _ewm_by_ticker(wilder_input, alpha=1 / 14).where(position >= 13, 0.0)
+    atr = atr.where(by_ticker.transform('size') >= 14)
+    df['atr'] = _zscore_by_ticker(atr)
+    
+    logger.info("Calculating MACD...")
+    macd_line = (
+        _ewm_by_ticker(close, span=12, min_periods=12) -
+        _ewm_by_ticker(close, span=26, min_periods=26)
+    )
+    df['macd'] = _zscore_by_ticker(macd_line)
+    
+    logger.info("Calculating Dollar Volume...")
     df['dollar_volume'] = (df['adj close'] * df['volume']) / 1e6
     
-    print("Calculating returns for multiple horizons...")
-    df = df.groupby(level=1, group_keys=False).apply(calculate_returns)
+    logger.info("Calculating returns for multiple horizons...")
+    df = calculate_returns(df)
     
     # Aggregate to monthly
-    print("Aggregating to monthly frequency...")
-    last_cols = [c for c in df.columns if c not in ['dollar_volume', 'volume', 'open', 'high', 'low', 'close']]
+    logger.info("Aggregating to monthly frequency...")
+    last_cols = [c for c in df.columns if c not in NON_LAST_COLS]
     
-    data = pd.concat([
-        df.unstack('ticker')['dollar_volume'].resample('M').mean().stack('ticker').to_frame('dollar_volume'),
-        df.unstack()[last_cols].resample('M').last().stack('ticker')
-    ], axis=1).dropna()
+    agg_spec = {'dollar_volume': 'mean'}
+    agg_spec.update({c: 'last' for c in last_cols})
+    data = df.groupby([
+        pd.Grouper(level='date', freq='M'),
+        pd.Grouper(level='ticker')
+    ]).agg(agg_spec).dropna()
     
     # Filter top liquid stocks
-    print("Filtering top 100 liquid stocks...")
-    data['dollar_volume'] = data.groupby('ticker')['dollar_volume'].transform(
-        lambda x: x.rolling(24, min_periods=12).mean()
+    logger.info("Filtering top 100 liquid stocks...")
+    data['dollar_volume'] = _align(
+        data['dollar_volume'].groupby(level='ticker').rolling(24, min_periods=12).mean(),
+        data.index
     )
-    data['dollar_vol_rank'] = data.groupby('date')['dollar_volume'].rank(ascending=False)
-    data = data[data['dollar_vol_rank'] < 100].drop(['dollar_volume', 'dollar_vol_rank'], axis=1)
+    by_date = data.groupby(level='date')['dollar_volume']
+    if by_date.size().max() < 100:
+        # Every stock ranks inside the top 100, no need to sort each month
+        keep = data['dollar_volume'].notna()
+    else:
+        keep = by_date.rank(ascending=False) < 100
+    data = data[keep].drop('dollar_volume', axis=1)
     
     return data.dropna()
 
+def _align(grouped_result, index):
+    """Drop the group level added by grouped window ops and restore row order"""
+    return grouped_result.droplevel(0).reindex(index)
+
+def _ewm_by_ticker(values, **kwargs):
+    """Per-ticker exponentially weighted mean (adjust=False, as in `ta`)"""
+    return _align(values.groupby(level='ticker').ewm(adjust=False, **kwargs).mean(), values.index)
+
+def _zscore_by_ticker(values):
+    """Standardize each ticker's series by its own mean and std"""
+    by_ticker = values.groupby(level='ticker')
+    return (values - by_ticker.transform('mean')) / by_ticker.transform('std')
+
 def calculate_returns(df):
-    """Calculate returns for multiple time horizons"""
+    """
+    Calculate returns for multiple time horizons
+    
+    Lagged returns for every ticker are built in one frame, clipped to each
+    ticker's own 0.5%/99.5% quantiles and converted to per-period returns.
+    
+    Parameters:
+    - df: DataFrame with an 'adj close' column (multi-index: date, ticker)
+    
+    Returns:
+    - The same DataFrame with return_{lag}m columns added
+    """
     outlier_cutoff = 0.005
     lags = [1, 2, 3, 6, 9, 12]
     
-    for lag in lags:
-        df[f'return_{lag}m'] = (
-            df['adj close']
-            .pct_change(lag)
-            .pipe(lambda x: x.clip(
-                lower=x.quantile(outlier_cutoff),
-                upper=x.quantile(1-outlier_cutoff)
-            ))
-            .add(1)
-            .pow(1/lag)
-            .sub(1)
-        )
+    close = df['adj close']
+    by_ticker = close.groupby(level='ticker')
+    returns = pd.DataFrame({
+        f'return_{lag}m': close / by_ticker.shift(lag) - 1
+        for lag in lags
+    })
+    
+    by_ticker = returns.groupby(level='ticker')
+    returns = returns.clip(
+        lower=by_ticker.transform('quantile', outlier_cutoff),
+        upper=by_ticker.transform('quantile', 1 - outlier_cutoff)
+    )
+    
+    df[returns.columns] = returns.add(1).pow([1 / lag for lag in lags]).sub(1)
     
     return df
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings for the API
+
+    gunicorn -c gunicorn_conf.py wsgi:app
+
+Request handlers only validate, enqueue and poll, so threads (gthread)
+carry the concurrency. Optimization jobs and their results live in the
+worker process's memory (see jobs.py), so a job must be polled from the
+process that queued it: keep a single worker process unless the job
+store is moved out of process.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 2 * multiprocessing.cpu_count() + 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
@@ -0,0 +1,66 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+    In-process background job queue
+
+    Jobs run on a small thread pool so request handlers only enqueue work
+    and return immediately. Finished jobs are kept for `ttl_seconds` so
+    clients can poll for the result.
+
+    Job functions receive a `progress` keyword argument; calling it with a
+    short stage description updates the job's `stage` field while it runs.
+    """
+
+    def __init__(self, max_workers=2, ttl_seconds=3600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.ttl_seconds = ttl_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, func, *args):
+        """Submit func(*args) and return the new job id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = {'status': 'queued', 'created_at': time.time()}
+        self.executor.submit(self._run, job_id, func, *args)
+        return job_id
+
+    def get(self, job_id):
+        """Return a copy of the job record, or None if unknown/expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, func, *args):
+        self._update(job_id, status='running')
+        try:
+            result = func(*args, progress=lambda stage: self._update(job_id, stage=stage))
+            self._update(job_id, status='finished', result=result, finished_at=time.time())
+        except Exception as e:
+            logger.exception("Error in job %s: %s", job_id, e)
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [k for k, v in self._jobs.items() if v.get('finished_at', cutoff + 1) < cutoff]
+        for k in expired:
+            del self._jobs[k]
+
+queue = JobQueue(
+    max_workers=int(os.getenv('JOB_WORKERS', 2)),
+    ttl_seconds=int(os.getenv('JOB_TTL_SECONDS', 3600))
+)
@@ -1,14 +1,17 @@
+import logging
 import numpy as np
 import pandas as pd
 from pypfopt import EfficientFrontier, risk_models, expected_returns
 from pypfopt.discrete_allocation import DiscreteAllocation
 
-def optimize_portfolio(stock_data, cluster_labels, risk_free_rate=0.05):
+logger = logging.getLogger(__name__)
+
+def optimize_portfolio(price_data, cluster_labels, risk_free_rate=0.05):
     """
     Optimize portfolio using Efficient Frontier (Max Sharpe Ratio)
     
     Parameters:
-    - stock_data: DataFrame with stock prices
+    - price_data: Wide DataFrame of adjusted closes (date x ticker)
     - cluster_labels: Cluster assignments for each stock
     - risk_free_rate: Risk-free rate for Sharpe calculation
     
@@ -16,19 +19,14 @@ def optimize_portfolio(stock_data, cluster_labels, risk_free_rate=0.05):
     - Dictionary with optimized weights, metrics, and allocation
     """
     try:
-        # Get the latest data for each ticker
-        latest_date = stock_data.index.get_level_values('date').max()
-        price_data = stock_data['adj close'].unstack('ticker')
-        
         # Select only stocks with valid cluster assignments
         valid_tickers = price_data.columns[:len(cluster_labels)]
         price_data = price_data[valid_tickers]
         
-        print(f"Optimizing portfolio with {len(valid_tickers)} stocks")
+        logger.info("Optimizing portfolio with %d stocks", len(valid_tickers))
         
         # Calculate expected returns and covariance
-        mu = expected_returns.mean_historical_return(price_data)
-        S = risk_models.sample_cov(price_data)
+        mu, S = _return_moments(price_data)
         
         # Optimize for max Sharpe ratio
         ef = EfficientFrontier(mu, S)
@@ -38,25 +36,59 @@ def optimize_portfolio(stock_data, cluster_labels, risk_free_rate=0.05):
         # Get performance metrics
         performance = ef.portfolio_performance(risk_free_rate=risk_free_rate, verbose=False)
         
-        # Filter out zero weights
-        non_zero_weights = {k: v for k, v in cleaned_weights.items() if v > 0.0001}
-        
-        # Sort by weight
-        sorted_weights = dict(sorted(non_zero_weights.items(), key=lambda x: x[1], reverse=True))
+        # Filter out zero weights and sort by weight (stable, largest first)
+        tickers = list(cleaned_weights)
+        w = np.fromiter(cleaned_weights.values(), dtype=np.float64, count=len(tickers))
+        keep = np.flatnonzero(w > 0.0001)
+        keep = keep[np.argsort(-w[keep], kind='stable')]
+        sorted_weights = dict(zip([tickers[i] for i in keep], w[keep].tolist()))
         
         results = {
             'weights': sorted_weights,
-            'expected_return': float(performance[0]),
-            'volatility': float(performance[1]),
-            'sharpe_ratio': float(performance[2]),
+            'expected_return': performance[0],
+            'volatility': performance[1],
+            'sharpe_ratio': performance[2],
             'n_selected_stocks': len(sorted_weights)
         }
         
-        print(f"Optimization complete. Sharpe Ratio: {performance[2]:.3f}")
-        print(f"Expected Return: {performance[0]:.2%}, Volatility: {performance[1]:.2%}")
+        logger.info("Optimization complete. Sharpe Ratio: %.3f", performance[2])
+        logger.info("Expected Return: %.2f%%, Volatility: %.2f%%", performance[0] * 100, performance[1] * 100)
         
         return results
         
     except Exception as e:
-        print(f"Error in portfolio optimization: {str(e)}")
-        raise
\ No newline at end of file
+        logger.error("Error in portfolio optimization: %s", e)
+        raise
+
+def _return_moments(price_data, frequency=252):
+    """
+    Annualised CAGR and sample covariance of daily returns, as computed by
+    PyPortfolioOpt's mean_historical_return and sample_cov, from a single
+    pass over the price matrix
+    
+    Parameters:
+    - price_data: Wide DataFrame of adjusted closes (date x ticker)
+    - frequency: Number of periods per year
+    
+    Returns:
+    - Tuple of (expected returns Series, covariance DataFrame)
+    """
+    prices = price_data.to_numpy(dtype=np.float64)
+    returns = prices[1:] / prices[:-1] - 1
+    
+    if np.isnan(returns).any():
+        # Gaps need pandas' pairwise NaN handling; still only one pct_change
+        returns = pd.DataFrame(returns, index=price_data.index[1:], columns=price_data.columns)
+        returns = returns.dropna(how='all')
+        mu = expected_returns.mean_historical_return(returns, returns_data=True, frequency=frequency)
+        S = risk_models.sample_cov(returns, returns_data=True, frequency=frequency)
+        return mu, S
+    
+    n = len(returns)
+    mu = np.prod(1 + returns, axis=0) ** (frequency / n) - 1
+    centered = returns - returns.mean(axis=0)
+    cov = (centered.T @ centered) * (frequency / (n - 1))
+    
+    tickers = price_data.columns
+    S = risk_models.fix_nonpositive_semidefinite(pd.DataFrame(cov, index=tickers, columns=tickers))
+    return pd.Series(mu, index=tickers), S
@@ -0,0 +1,28 @@
+from datetime import date
+from typing import List
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+class OptimizeRequest(BaseModel):
+    """Validated body of POST /api/optimize"""
+    tickers: List[str]
+    start_date: date
+    end_date: date
+    n_clusters: int = Field(4, ge=2)
+    risk_free_rate: float = 0.05
+
+    @field_validator('tickers')
+    @classmethod
+    def normalize_tickers(cls, tickers):
+        # Deduplicate and canonicalize so equivalent requests share cache keys
+        tickers = sorted({t.strip().upper() for t in tickers if t.strip()})
+        if len(tickers) < 2:
+            raise ValueError('at least 2 distinct tickers are required')
+        return tickers
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a pydantic ValidationError into a single readable line"""
+    return '; '.join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
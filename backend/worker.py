@@ -0,0 +1,85 @@
+import logging
+
+from data_fetcher import fetch_stock_data
+from feature_engineering import calculate_features
+from clustering import perform_clustering
+from portfolio_optimizer import optimize_portfolio
+from backtesting import backtest_strategy
+from cache import price_cache, ttl_for_window
+
+logger = logging.getLogger(__name__)
+
+def load_stock_data(tickers, start_date, end_date, use_cache=True):
+    """Fetch stock data, serving repeat requests from the price cache"""
+    if not use_cache:
+        return fetch_stock_data(tickers, start_date, end_date)
+
+    key = price_cache.make_key(tickers, start_date, end_date)
+    return price_cache.get_or_compute(
+        key,
+        lambda: fetch_stock_data(tickers, start_date, end_date),
+        ttl_days=ttl_for_window(end_date)
+    )
+
+def run_optimize(req, use_cache=True, progress=None):
+    """
+    Run the full optimization pipeline for a validated request
+
+    Parameters:
+    - req: OptimizeRequest with tickers, dates, n_clusters and risk_free_rate
+    - use_cache: Serve price data from the local cache when available
+    - progress: Optional callback called with the name of each pipeline stage
+
+    Returns:
+    - Dictionary with clusters, portfolio and backtest results
+    """
+    tickers = req.tickers
+    start_date = req.start_date.isoformat()
+    end_date = req.end_date.isoformat()
+    n_clusters = req.n_clusters
+    risk_free_rate = req.risk_free_rate
+    report = progress or (lambda stage: None)
+
+    # Step 1: Fetch data
+    report('Fetching data')
+    logger.info("Fetching data for %d stocks...", len(tickers))
+    stock_data = load_stock_data(tickers, start_date, end_date, use_cache)
+
+    if stock_data.empty:
+        raise ValueError("No data fetched. Check tickers and date range.")
+
+    # Wide adjusted-close prices (date x ticker), pivoted once and reused
+    price_df = stock_data['adj close'].unstack('ticker')
+
+    # Step 2: Calculate features
+    report('Calculating features')
+    logger.info("Calculating technical indicators...")
+    features_df = calculate_features(stock_data)
+
+    # Step 3: Perform clustering
+    report('Clustering')
+    logger.info("Performing K-means clustering with %d clusters...", n_clusters)
+    cluster_results = perform_clustering(features_df, n_clusters)
+
+    # Step 4: Optimize portfolio
+    report('Optimizing portfolio')
+    logger.info("Optimizing portfolio...")
+    portfolio_results = optimize_portfolio(price_df, cluster_results['labels'], risk_free_rate)
+
+    # Step 5: Backtest
+    report('Backtesting')
+    logger.info("Backtesting strategy...")
+    backtest_results = backtest_strategy(
+        stock_data,
+        portfolio_results['weights'],
+        price_data=price_df,
+        risk_free_rate=risk_free_rate
+    )
+
+    return {
+        "success": True,
+        "clusters": cluster_results,
+        "portfolio": portfolio_results,
+        "backtest": backtest_results,
+        "message": "Portfolio optimization completed successfully"
+    }
@@ -15,6 +15,7 @@ function App() {
   });
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [stage, setStage] = useState(null);
   const [error, setError] = useState(null);
 
   const handleOptimize = async () => {
@@ -24,6 +25,7 @@ function App() {
     }
 
     setLoading(true);
+    setStage(null);
     setError(null);
     setResults(null);
 
@@ -34,13 +36,14 @@ function App() {
         end_date: parameters.endDate,
         n_clusters: parameters.nClusters,
         risk_free_rate: parameters.riskFreeRate
-      });
+      }, setStage);
 
       setResults(data);
     } catch (err) {
       setError(err.message || 'An error occurred during optimization');
     } finally {
       setLoading(false);
+      setStage(null);
     }
   };
 
@@ -68,7 +71,7 @@ function App() {
             onClick={handleOptimize}
             disabled={loading || tickers.length < 5}
           >
-            {loading ? '⏳ Optimizing...' : '🚀 Optimize Portfolio'}
+            {loading ? `⏳ ${stage || 'Optimizing'}...` : '🚀 Optimize Portfolio'}
           </button>
 
           {error && (
@@ -9,13 +9,37 @@ const api = axios.create({
   },
 });
 
-export const optimizePortfolio = async (params) => {
+const JOB_POLL_INTERVAL_MS = 2000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const waitForJob = async (jobId, onProgress) => {
+  while (true) {
+    const response = await api.get(`/api/jobs/${jobId}`);
+    const job = response.data;
+    if (job.status === 'finished') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Optimization job failed');
+    }
+    if (onProgress && job.stage) {
+      onProgress(job.stage);
+    }
+    await sleep(JOB_POLL_INTERVAL_MS);
+  }
+};
+
+export const optimizePortfolio = async (params, onProgress) => {
   try {
     const response = await api.post('/api/optimize', params);
+    if (response.status === 202) {
+      return await waitForJob(response.data.job_id, onProgress);
+    }
     return response.data;
   } catch (error) {
     console.error('API Error:', error.response?.data || error.message);
-    throw new Error(error.response?.data?.error || 'Failed to optimize portfolio');
+    throw new Error(error.response?.data?.error || error.message || 'Failed to optimize portfolio');
   }
 };
 